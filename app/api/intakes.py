@@ -1,10 +1,16 @@
 from fastapi import APIRouter, HTTPException, Header
 from pydantic import BaseModel
+import asyncio
+import logging
 import uuid
-import hashlib
+from ..core.checksum import compute_checksum
 from ..core.config import config
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
+
+# Cleared once PostgREST reports intakes.object_key missing (README migration not run yet)
+_object_key_column_available = True
 
 class   InitIntakeResponse(BaseModel):
     intake_id: str
@@ -68,6 +74,42 @@ async def init_intake(
         
         raise HTTPException(status_code=500, detail=f"Error creating intake: {str(e)}")
 
+def _mark_intake_ready(intake_id: str, checksum: str, file_size: int, object_key: str):
+    """
+    Mark a finalized intake ready for processing.
+    
+    Records object_key when the column exists; without it the worker falls back to
+    listing the intake's storage path.
+    
+    Args:
+        intake_id: ID of the intake
+        checksum: Checksum of the stored file
+        file_size: Size of the stored file in bytes
+        object_key: The exact object the checksum was computed over
+    """
+    global _object_key_column_available
+    update = {
+        "status": "ready",
+        "next_retry_at": "now()",
+        "checksum": checksum,
+        "size_bytes": file_size
+    }
+    
+    if _object_key_column_available:
+        try:
+            config._get_supabase_client().table("intakes").update(
+                {**update, "object_key": object_key}
+            ).eq("id", intake_id).execute()
+            return
+        except Exception as e:
+            # PGRST204: column not found in the schema cache
+            if getattr(e, "code", None) != "PGRST204":
+                raise
+            _object_key_column_available = False
+            logger.warning(f"intakes.object_key is missing, finalizing without it until restart: {e}")
+    
+    config._get_supabase_client().table("intakes").update(update).eq("id", intake_id).execute()
+
 @router.post("/intakes/{intake_id}/finalize")
 async def finalize_intake(
     intake_id: str,
@@ -111,24 +153,25 @@ async def finalize_intake(
             storage_path = intake["storage_path"]
             path_for_listing = storage_path.rstrip('/')
             
-            files_result = config._get_supabase_client().storage.from_("intakes-raw").list(path_for_listing)
+            # Storage I/O and hashing run in threads so the event loop (shared with the
+            # worker) stays responsive while files of up to 10MB are read
+            files_result = await asyncio.to_thread(
+                config._get_supabase_client().storage.from_("intakes-raw").list, path_for_listing
+            )
             
             if files_result and len(files_result) > 0:
                 file_info = files_result[0]
                 file_path = f"{path_for_listing}/{file_info['name']}"
                 
-                file_content = config._get_supabase_client().storage.from_("intakes-raw").download(file_path)
+                file_content = await asyncio.to_thread(
+                    config._get_supabase_client().storage.from_("intakes-raw").download, file_path
+                )
                 
-                # Calculate MD5 checksum and size
-                checksum = hashlib.md5(file_content).hexdigest()
+                # Calculate checksum and size
+                checksum = await asyncio.to_thread(compute_checksum, file_content)
                 file_size = len(file_content)
                 
-                config._get_supabase_client().table("intakes").update({
-                    "status": "ready",
-                    "next_retry_at": "now()",
-                    "checksum": checksum,
-                    "size_bytes": file_size
-                }).eq("id", intake_id).execute()
+                await asyncio.to_thread(_mark_intake_ready, intake_id, checksum, file_size, file_path)
                 
                 return {
                     "message": "Intake finalization successful",
@@ -139,10 +182,10 @@ async def finalize_intake(
                     "file_size": file_size
                 }
             else:
-                config._get_supabase_client().table("intakes").update({
+                await asyncio.to_thread(config._get_supabase_client().table("intakes").update({
                     "status": "error-uploading",
                     "last_error": "No files found in storage path after upload"
-                }).eq("id", intake_id).execute()
+                }).eq("id", intake_id).execute)
                 
                 return {
                     "message": "Intake finalization failed",
@@ -153,10 +196,10 @@ async def finalize_intake(
                 
         except Exception as storage_error:
             error_message = f"Storage finalization failed: {str(storage_error)}"
-            config._get_supabase_client().table("intakes").update({
+            await asyncio.to_thread(config._get_supabase_client().table("intakes").update({
                 "status": "error-uploading",
                 "last_error": error_message
-            }).eq("id", intake_id).execute()
+            }).eq("id", intake_id).execute)
             
             return {
                 "message": "Intake finalization failed",
@@ -1,5 +1,6 @@
 from fastapi import APIRouter, HTTPException, Header, UploadFile, File, Form
 from datetime import datetime
+import asyncio
 from ..core.config import config
 
 router = APIRouter()
@@ -83,7 +84,9 @@ async def upload_file(
         storage_path = f"{intake['storage_path']}{file.filename}"
         
         # Create the file in storage
-        storage_result = config._get_supabase_client().storage.from_("intakes-raw").upload(
+        # Off the event loop (shared with the worker): uploads can be up to 10MB
+        storage_result = await asyncio.to_thread(
+            config._get_supabase_client().storage.from_("intakes-raw").upload,
             path=storage_path,
             file=content,
             file_options={"content-type": "text/plain"}
@@ -177,7 +180,9 @@ async def upload_pasted_text(
         storage_path = f"{intake['storage_path']}{original_filename}"
         
         # Create the file in storage
-        storage_result = config._get_supabase_client().storage.from_("intakes-raw").upload(
+        # Off the event loop (shared with the worker): uploads can be up to 10MB
+        storage_result = await asyncio.to_thread(
+            config._get_supabase_client().storage.from_("intakes-raw").upload,
             path=storage_path,
             file=content,
             file_options={"content-type": "text/plain"}
@@ -85,7 +85,7 @@ async def start_worker():
     """Start the worker (if not already running)."""
     try:
         from app.worker.manager import start_worker as start_worker_func
-        success = start_worker_func()
+        success = await start_worker_func()
         
         if success:
             return {
@@ -110,7 +110,7 @@ async def stop_worker():
     """Stop the worker."""
     try:
         from app.worker.manager import stop_worker as stop_worker_func
-        stop_worker_func()
+        await stop_worker_func()
         
         return {
             "message": "Worker stopped successfully",
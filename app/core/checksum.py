@@ -0,0 +1,92 @@
+"""
+Checksums for intake content.
+
+New checksums are stored with a prefix naming their algorithm, chosen by CHECKSUM_ALGORITHM:
+"b2:" for BLAKE2b (128-bit digest, the default) or "b3:" for BLAKE3, which needs the optional
+`blake3` package (SIMD-accelerated). Unprefixed values are legacy MD5 digests and remain
+verifiable.
+"""
+
+import hashlib
+
+from app.core.config import config
+
+try:
+    import blake3
+except ImportError:
+    blake3 = None
+
+BLAKE3_PREFIX = "b3:"
+BLAKE2B_PREFIX = "b2:"
+BLAKE2B_DIGEST_SIZE = 16  # bytes; same length as MD5 so the hex digest stays 32 characters
+
+# Prefix of each hash object's `name`; MD5 digests are stored unprefixed
+_PREFIXES = {"blake3": BLAKE3_PREFIX, "blake2b": BLAKE2B_PREFIX}
+
+def _new_blake3():
+    if blake3 is None:
+        raise ValueError("Checksum uses BLAKE3 but the blake3 package is not installed")
+    return blake3.blake3()
+
+def _new_blake2b():
+    return hashlib.blake2b(digest_size=BLAKE2B_DIGEST_SIZE)
+
+_HASHER_FACTORIES = {"blake3": _new_blake3, "blake2b": _new_blake2b}
+
+def _select_hasher(algorithm: str):
+    """Return the hasher factory for the configured algorithm, failing loudly if it cannot be used."""
+    if algorithm not in _HASHER_FACTORIES:
+        raise ValueError(f"Unsupported CHECKSUM_ALGORITHM {algorithm!r}; expected one of {sorted(_HASHER_FACTORIES)}")
+    if algorithm == "blake3" and blake3 is None:
+        raise ValueError("CHECKSUM_ALGORITHM is blake3 but the blake3 package is not installed")
+    return _HASHER_FACTORIES[algorithm]
+
+# Picked from config rather than from whichever packages happen to be importable, so every
+# host records the same algorithm; an unusable setting stops the app at import
+_new_preferred_hasher = _select_hasher(config.checksum_algorithm)
+
+def compute_checksum(content: bytes) -> str:
+    """
+    Compute the checksum recorded for new intake content.
+
+    Args:
+        content: Raw content bytes
+
+    Returns:
+        Prefixed hex digest using the configured algorithm
+    """
+    hasher = _new_preferred_hasher()
+    hasher.update(content)
+    return format_checksum(hasher)
+
+def new_hasher(expected_checksum: str):
+    """
+    Create an incremental hasher matching the algorithm of a recorded checksum.
+
+    Args:
+        expected_checksum: Checksum as stored on the intake
+
+    Returns:
+        Hash object to feed with `update()`
+
+    Raises:
+        ValueError: If the checksum uses BLAKE3 and the blake3 package is not installed
+    """
+    if expected_checksum:
+        if expected_checksum.startswith(BLAKE3_PREFIX):
+            return _new_blake3()
+        if expected_checksum.startswith(BLAKE2B_PREFIX):
+            return _new_blake2b()
+    return hashlib.md5()
+
+def format_checksum(hasher) -> str:
+    """
+    Render a finished hasher in the same form as the stored checksum.
+
+    Args:
+        hasher: Hash object returned by `new_hasher`
+
+    Returns:
+        Checksum string comparable with the recorded value
+    """
+    return _PREFIXES.get(hasher.name, "") + hasher.hexdigest()
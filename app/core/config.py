@@ -1,6 +1,7 @@
+import functools
 import os
 import time
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional, Tuple
 from supabase import create_client, Client
 from dotenv import load_dotenv
 import logging
@@ -11,6 +12,23 @@ logger = logging.getLogger(__name__)
 _secrets_cache = {}  # {id: (secrets, expiry)}
 SECRETS_CACHE_TTL = 12 * 3600  # 12 hours
 
+@functools.lru_cache(maxsize=1)
+def get_shared_supabase_client(supabase_url: str, supabase_key: str) -> Client:
+    """
+    Get the process-wide Supabase client, creating it on first use.
+    
+    Reusing one client keeps its HTTP connection pool (and TLS sessions) warm
+    across requests and worker jobs.
+    
+    Args:
+        supabase_url: Supabase project URL
+        supabase_key: Supabase service role key
+        
+    Returns:
+        Shared Supabase client
+    """
+    return create_client(supabase_url, supabase_key)
+
 class Config:
     """Configuration class for the ingestion pipeline."""
     
@@ -28,6 +46,10 @@ class Config:
         self.worker_max_retry_attempts = int(os.getenv("WORKER_MAX_RETRY_ATTEMPTS", "5"))
         self.worker_base_retry_delay = int(os.getenv("WORKER_BASE_RETRY_DELAY", "60"))
         self.worker_stats_log_interval = int(os.getenv("WORKER_STATS_LOG_INTERVAL", "300"))
+        self.worker_stats_ttl_seconds = int(os.getenv("WORKER_STATS_TTL_SECONDS", "10"))
+        
+        # Algorithm for new intake checksums: "blake2b" or "blake3" (needs the blake3 package)
+        self.checksum_algorithm = os.getenv("CHECKSUM_ALGORITHM", "blake2b")
         
         # Pulse API configuration
         self.pulse_api_base_url = os.getenv("PULSE_API_BASE_URL", "https://dev.pulse-core.getpulseinsights.ai")
@@ -36,8 +58,8 @@ class Config:
         self.tenant_id: Optional[str] = None
         
     def _get_supabase_client(self) -> Client:
-        """Get or create Supabase client."""
-        return create_client(self.supabase_url, self.supabase_key)
+        """Get the shared Supabase client."""
+        return get_shared_supabase_client(self.supabase_url, self.supabase_key)
     
     def _resolve_tenant_from_org(self, org_name: str) -> str:
         """
@@ -72,46 +94,81 @@ class Config:
             logger.error(f"Failed to resolve tenant for org {org_name}: {e}")
             raise ValueError(f"Tenant resolution failed: {e}")
     
-    def load_tenant_secrets(self, org_name: str) -> bool:
+    def resolve_tenant_secrets(self, org_name: str) -> Optional[Tuple[str, Dict[str, Any]]]:
         """
-        Load tenant-specific secrets for the given org_id.
+        Resolve an org and load its secrets without touching this instance's state.
+        
+        Safe to call from several threads at once (e.g. via `asyncio.to_thread`).
         
         Args:
-            org_id: Organization ID from request header
+            org_name: Organization name from request header
             
         Returns:
-            True if secrets loaded successfully
+            (org_id, secrets) if secrets loaded successfully, None otherwise
         """
         try:
             # Resolve tenant_id from org_id
             id = self._resolve_tenant_from_org(org_name)
-            self.org_id = id
-            print(id)
             
             # Check cache first
             cached = _secrets_cache.get(id)
             if cached and cached[1] > time.time():
-                self.secrets = cached[0]
-                logger.info(f"✅ Loaded {len(self.secrets)} secrets from cache for tenant {id}")
-                return True
+                logger.info(f"✅ Loaded {len(cached[0])} secrets from cache for tenant {id}")
+                return id, cached[0]
             
             # Load from database
             client = self._get_supabase_client()
             result = client.table("tenant_secrets").select("*").eq("org_id", id).single().execute()
             
             if result.data:
-                self.secrets = result.data
                 # Cache the result
-                _secrets_cache[id] = (self.secrets, time.time() + SECRETS_CACHE_TTL)
-                logger.info(f"✅ Loaded {len(self.secrets)} secrets from database for tenant {id}")
-                return True
+                _secrets_cache[id] = (result.data, time.time() + SECRETS_CACHE_TTL)
+                logger.info(f"✅ Loaded {len(result.data)} secrets from database for tenant {id}")
+                return id, result.data
             else:
                 logger.error(f"No secrets found for tenant {id}")
-                return False
+                return None
                 
         except Exception as e:
             logger.error(f"Error loading tenant secrets for org {org_name}: {e}")
+            return None
+    
+    def load_tenant_secrets(self, org_name: str) -> bool:
+        """
+        Load tenant-specific secrets for the given org into this instance.
+        
+        Args:
+            org_name: Organization name from request header
+            
+        Returns:
+            True if secrets loaded successfully
+        """
+        tenant = self.resolve_tenant_secrets(org_name)
+        if tenant is None:
             return False
+        
+        self.org_id, self.secrets = tenant
+        return True
+    
+    def preload_tenant_secrets(self, org_names: List[str]) -> Dict[str, str]:
+        """
+        Load secrets for several orgs up front so later loads are served from cache.
+        
+        Args:
+            org_names: Organization names to preload
+            
+        Returns:
+            Mapping of org_id to org_name for every org whose secrets loaded
+        """
+        loaded = {}
+        for org_name in org_names:
+            # Use the resolved id directly; self.org_id may be overwritten by concurrent loads
+            tenant = self.resolve_tenant_secrets(org_name)
+            if tenant is not None:
+                loaded[tenant[0]] = org_name
+        
+        logger.info(f"✅ Preloaded secrets for {len(loaded)}/{len(org_names)} orgs")
+        return loaded
     
     def get_secret(self, key: str, default: Any = None) -> Any:
         """Get a secret value by key."""
@@ -5,6 +5,7 @@ Based on pulse implementation.
 
 from fastapi import Request, HTTPException
 from app.core.config import config
+import asyncio
 import logging
 
 logger = logging.getLogger(__name__)
@@ -22,14 +23,15 @@ async def tenant_middleware(request: Request, call_next):
             raise HTTPException(status_code=400, detail="Missing x-org-name header")
 
         try:
-            success = config.load_tenant_secrets(org_name)
-            if not success:
+            # Off the event loop (shared with the worker); results are returned, not read
+            # back from the shared config, so concurrent requests cannot see each other's
+            tenant = await asyncio.to_thread(config.resolve_tenant_secrets, org_name)
+            if tenant is None:
                 raise HTTPException(status_code=500, detail="Failed to load tenant configuration")
 
-            request.state.id = config.org_id
-            request.state.secrets = config.secrets
+            request.state.id, request.state.secrets = tenant
             request.state.org_name = org_name
-            logger.info(f"✅ Tenant resolved: org_name={org_name}, tenant_id={config.tenant_id}")
+            logger.info(f"✅ Tenant resolved: org_name={org_name}, tenant_id={request.state.id}")
         except Exception as e:
             logger.error(f"Tenant resolution failed for org {org_name}: {e}")
             raise HTTPException(status_code=500, detail=f"Tenant resolution failed: {str(e)}")
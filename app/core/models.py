@@ -13,6 +13,7 @@ class Intake(BaseModel):
     org_id: str
     status: str
     storage_path: str
+    object_key: Optional[str] = None
     size_bytes: Optional[int] = None
     checksum: Optional[str] = None
     idempotency_key: UUID
@@ -41,6 +42,7 @@ class IntakeCreate(BaseModel):
 class IntakeUpdate(BaseModel):
     """Model for updating an intake."""
     status: Optional[str] = None
+    object_key: Optional[str] = None
     size_bytes: Optional[int] = None
     checksum: Optional[str] = None
     attempts: Optional[int] = None
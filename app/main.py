@@ -7,9 +7,8 @@ from app.core.middleware import tenant_middleware
 from app.core.config import config
 from dotenv import load_dotenv
 from datetime import datetime, timezone
+import asyncio
 import logging
-import signal
-import sys
 from pydantic import BaseModel
 from app.worker import manager as worker_manager
 from app.service.pulse import PulseLive
@@ -50,6 +49,16 @@ app.include_router(intakes_router, prefix="/api", tags=["intakes"])
 app.include_router(uploads_router, prefix="/api", tags=["uploads"])
 app.include_router(worker_router, prefix="/api", tags=["worker"])
 
+@app.on_event("startup")
+async def start_background_worker():
+    """Run the extraction worker as a task on the application's event loop."""
+    await worker_manager.start_worker()
+
+@app.on_event("shutdown")
+async def stop_background_worker():
+    """Stop the extraction worker before the server exits."""
+    await worker_manager.stop_worker()
+
 class QueryRequest(BaseModel):
     question: str
 
@@ -71,7 +80,8 @@ async def scooby_query(internal: Request, request: QueryRequest):
     with tool integration for Pinecone and Neo4j queries.
     """
     try:
-        tools = GeminiTools(internal.state.secrets)
+        # GeminiTools connects to Neo4j and Pinecone synchronously
+        tools = await asyncio.to_thread(GeminiTools, internal.state.secrets)
         model = PulseLive(tools=tools)
         response = await model.connect_to_gemini(request.question)
         
@@ -164,21 +174,11 @@ async def get_memories(
     
     
 if __name__ == "__main__":
-    def signal_handler(signum, frame):
-        """Handle shutdown signals."""
-        logging.info(f"Received signal {signum}, shutting down...")
-        worker_manager.stop_worker()
-        sys.exit(0)
-    
-    # Set up signal handlers
-    signal.signal(signal.SIGINT, signal_handler)
-    signal.signal(signal.SIGTERM, signal_handler)
-    
+    # uvicorn handles SIGINT/SIGTERM and runs the shutdown hook, which stops the worker
     import uvicorn
     try:
         uvicorn.run(app, host="0.0.0.0", port=8001)
     except KeyboardInterrupt:
         logging.info("FastAPI server interrupted")
-        worker_manager.stop_worker()
     finally:
         logging.info("Server shutdown complete")
\ No newline at end of file
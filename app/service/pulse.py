@@ -3,6 +3,7 @@ from app.core.tools import GeminiTools
 from google.genai.types import FunctionDeclaration
 from google.genai import types 
 from app.core.pulse_prompt import prompt_for_retrieval
+import asyncio
 import os
 from dotenv import load_dotenv
 
@@ -124,11 +125,11 @@ class PulseLive():
                             try:
                                 if function_name == "connections_retrieval_tool":
                                     event = function_args.get("event_names")
-                                    data = self.tool_executor.get_event_connections(event)
+                                    data = await asyncio.to_thread(self.tool_executor.get_event_connections, event)
                                     
                                 elif function_name == "pc_retrieval_tool":
                                     query = function_args.get("query")
-                                    data = self.tool_executor.pc_retrieval_tool(query)
+                                    data = await asyncio.to_thread(self.tool_executor.pc_retrieval_tool, query)
                                 
                                 else:
                                     data = {"error": f"Unknown function: {function_name}"}
@@ -3,98 +3,204 @@ HTTP client service for calling the pulse project's extraction API.
 Handles authentication, content upload, and response processing.
 """
 
+import asyncio
+import random
 import httpx
 import logging
-from typing import Dict, Any, Optional
-from app.core.config import Config
+import orjson
+import uuid
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import AsyncIterator, Callable, Dict, Any, Optional
 
 logger = logging.getLogger(__name__)
 
+# Retry policy for extraction calls
+EXTRACT_MAX_ATTEMPTS = 3
+EXTRACT_BASE_DELAY = 1.0  # seconds
+EXTRACT_MAX_DELAY = 30.0  # seconds
+EXTRACT_JITTER = 0.5
+# Transient statuses worth retrying; any other 4xx/5xx is treated as unrecoverable
+RETRYABLE_STATUS_CODES = {408, 429, 502, 503, 504}
+# Statuses for which the server may tell us how long to wait via Retry-After
+RETRY_AFTER_STATUS_CODES = {429, 503}
+
 class PulseAPIClient:
     """Client for calling the pulse project's extraction API."""
     
-    def __init__(self, base_url: str, org_name: str):
+    def __init__(self, base_url: str, org_name: str, org_id: str, max_connections: int = 10, shared: bool = False):
         """
         Initialize the pulse API client.
         
+        Performs no I/O; the caller supplies the org ID it already knows.
+        
         Args:
             base_url: Base URL of the pulse API (e.g., "http://localhost:8000")
+            org_name: Organization name sent to the API for tenant isolation
             org_id: Organization ID for tenant isolation
+            max_connections: Connection pool size (all kept alive for reuse)
+            shared: Whether the client is cached and reused; `async with` then leaves it open
         """
         self.base_url = base_url.rstrip('/')
-        self.config = Config()
         self.org_name = org_name
-        
-        org_resp = (
-            self.config._get_supabase_client()
-            .table("orgs")
-            .select("id")
-            .eq("org_name", org_name)
-            .execute()
-        )
-
-        from fastapi import HTTPException
-        if not org_resp.data:
-            raise HTTPException(status_code=404, detail="Organization not found")
-
-        self.org_id = org_resp.data[0]["id"] 
-        
+        self.org_id = org_id
+        self.shared = shared
+        # Built once; every request reuses them
+        self._base_headers = {"x-org-name": org_name}
+        self._status_headers = {"x-org-id": org_id}
+        self._extract_url = f"{self.base_url}/api/v1/ingestion/"
+        self._status_url = f"{self.base_url}/api/v1/ingestion/status"
         
         # Create HTTP client with timeout
         self.client = httpx.AsyncClient(
             timeout=httpx.Timeout(300.0),  # 5 minutes for extraction
-            limits=httpx.Limits(max_keepalive_connections=5, max_connections=10)
+            limits=httpx.Limits(max_keepalive_connections=max_connections, max_connections=max_connections)
         )
         
         logger.info(f"✅ Pulse API client initialized for org {org_name} at {base_url}")
     
-    async def extract_content(self, content: str, filename: str = "document.txt", intake_id: str = None) -> Optional[Dict[str, Any]]:
+    async def extract_content_stream(
+        self,
+        open_stream: Callable[[], AsyncIterator[bytes]],
+        intake_id: str,
+        filename: str = "document.txt"
+    ) -> Optional[Dict[str, Any]]:
         """
-        Send content to the pulse extraction API for processing.
+        Stream content to the pulse extraction API without holding it in memory.
+        
+        The file is sent as a chunked multipart upload. `open_stream` is called once per
+        attempt, so retries re-read the content from its source. Errors raised by the
+        stream itself (e.g. a checksum mismatch) propagate to the caller.
         
         Args:
-            content: Text content to extract
-            filename: Filename for the content (used by the API)
+            open_stream: Factory returning a fresh iterator over the content bytes
             intake_id: The intake ID to track this extraction job
+            filename: Filename for the content (used by the API)
             
         Returns:
             Extraction result dictionary if successful, None otherwise
         """
-        try:
-            files = {"file": (filename, content.encode('utf-8'), "text/plain")}
-            headers = {"x-org-name": self.org_name}
-            
-            # Add intake ID header if provided
-            if intake_id:
-                headers["x-intake-id"] = intake_id
-            
-            url = f"{self.base_url}/api/v1/ingestion/"
+        boundary = uuid.uuid4().hex
+        headers = {
+            **self._base_headers,
+            "x-intake-id": intake_id,
+            "Idempotency-Key": intake_id,
+            "Content-Type": f"multipart/form-data; boundary={boundary}"
+        }
+        head = (
+            f"--{boundary}\r\n"
+            f'Content-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+            "Content-Type: text/plain\r\n\r\n"
+        ).encode()
+        tail = f"\r\n--{boundary}--\r\n".encode()
+        
+        async def multipart_body() -> AsyncIterator[bytes]:
+            yield head
+            # The closing boundary is only sent once the stream has finished cleanly
+            async for chunk in open_stream():
+                yield chunk
+            yield tail
+        
+        url = self._extract_url
+        
+        logger.info(f"🔄 Streaming content to pulse API: {url}")
+        logger.info(f"📋 Intake ID: {intake_id}")
+        
+        result = await self._post_with_backoff(url, headers=headers, content=multipart_body)
+        if result is not None:
+            logger.info(f"✅ Extraction API call successful: {result.get('message', 'No message')}")
+        return result
+    
+    async def _post_with_backoff(
+        self,
+        url: str,
+        headers: Dict[str, str],
+        content: Callable[[], AsyncIterator[bytes]],
+        max_attempts: int = EXTRACT_MAX_ATTEMPTS,
+        base_delay: float = EXTRACT_BASE_DELAY,
+        max_delay: float = EXTRACT_MAX_DELAY,
+        jitter: float = EXTRACT_JITTER
+    ) -> Optional[Dict[str, Any]]:
+        """
+        POST to the extraction API, retrying transient failures with capped exponential backoff.
+        
+        Timeouts, connection errors, retryable status codes and undecodable JSON bodies are
+        retried; any other non-200 response is returned as a failure immediately.
+        
+        Args:
+            url: Endpoint to call
+            headers: Request headers
+            content: Factory for a streamed request body, called once per attempt
+            max_attempts: Total number of attempts (including the first)
+            base_delay: Delay before the first retry (seconds)
+            max_delay: Upper bound for the computed backoff (seconds)
+            jitter: Maximum fractional jitter added on top of the backoff
             
-            logger.info(f"🔄 Sending content to pulse API: {url}")
-            logger.info(f"Content length: {len(content)} characters")
-            if intake_id:
-                logger.info(f"📋 Intake ID: {intake_id}")
+        Returns:
+            Decoded JSON response if successful, None otherwise
+        """
+        for attempt in range(1, max_attempts + 1):
+            retry_after = None
+            try:
+                response = await self.client.post(url, content=content(), headers=headers)
+                
+                if response.status_code == 200:
+                    # orjson parses the raw body bytes directly, skipping the str decode
+                    return orjson.loads(response.content)
+                
+                if response.status_code not in RETRYABLE_STATUS_CODES:
+                    logger.error(f"❌ Extraction API call failed: {response.status_code} - {response.text}")
+                    return None
+                
+                logger.warning(f"⚠️ Extraction API returned {response.status_code} (attempt {attempt}/{max_attempts})")
+                if response.status_code in RETRY_AFTER_STATUS_CODES:
+                    retry_after = self._parse_retry_after(response)
+                    if retry_after is not None and retry_after > max_delay:
+                        logger.error(f"❌ Extraction API asked to retry after {retry_after:.0f}s (> {max_delay:.0f}s), giving up")
+                        return None
+                
+            except httpx.TimeoutException:
+                logger.warning(f"⚠️ Extraction API call timed out (attempt {attempt}/{max_attempts})")
+            except httpx.RequestError as e:
+                logger.warning(f"⚠️ Extraction API request error (attempt {attempt}/{max_attempts}): {e}")
+            except orjson.JSONDecodeError as e:
+                logger.warning(f"⚠️ Extraction API returned invalid JSON (attempt {attempt}/{max_attempts}): {e}")
             
-            # Make the API call
-            response = await self.client.post(url, files=files, headers=headers)
+            if attempt == max_attempts:
+                break
             
-            if response.status_code == 200:
-                result = response.json()
-                logger.info(f"✅ Extraction API call successful: {result.get('message', 'No message')}")
-                return result
+            delay = min(max_delay, base_delay * (2 ** (attempt - 1))) * (1 + random.uniform(0, jitter))
+            if retry_after is not None:
+                delay = max(delay, retry_after)
+                logger.info(f"Retrying extraction API call in {delay:.2f}s (server requested Retry-After: {retry_after:.2f}s)")
             else:
-                logger.error(f"❌ Extraction API call failed: {response.status_code} - {response.text}")
-                return None
-                
-        except httpx.TimeoutException:
-            logger.error("❌ Extraction API call timed out")
-            return None
-        except httpx.RequestError as e:
-            logger.error(f"❌ Extraction API request error: {e}")
+                logger.info(f"Retrying extraction API call in {delay:.2f}s")
+            await asyncio.sleep(delay)
+        
+        logger.error(f"❌ Extraction API call failed after {max_attempts} attempts")
+        return None
+    
+    @staticmethod
+    def _parse_retry_after(response: httpx.Response) -> Optional[float]:
+        """
+        Return the Retry-After delay in seconds, if the server sent one.
+        
+        Accepts both forms allowed by RFC 9110: delay-seconds and an HTTP-date.
+        """
+        value = response.headers.get("retry-after")
+        if not value:
             return None
-        except Exception as e:
-            logger.error(f"❌ Unexpected error calling extraction API: {e}")
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            retry_at = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
             return None
+        if retry_at.tzinfo is None:
+            retry_at = retry_at.replace(tzinfo=timezone.utc)
+        return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
     
     async def get_api_status(self) -> Optional[Dict[str, Any]]:
         """
@@ -104,9 +210,7 @@ class PulseAPIClient:
             API status information if successful, None otherwise
         """
         try:
-            url = f"{self.base_url}/api/v1/ingestion/status"
-            headers = {"x-org-id": self.org_id}
-            response = await self.client.get(url, headers=headers)
+            response = await self.client.get(self._status_url, headers=self._status_headers)
             
             if response.status_code == 200:
                 return response.json()
@@ -123,18 +227,10 @@ class PulseAPIClient:
         await self.client.aclose()
         logger.info("Pulse API client closed")
     
-    def __del__(self):
-        """Cleanup when the object is destroyed."""
-        try:
-            # Try to close the client if it's still open
-            if hasattr(self, 'client') and not self.client.is_closed:
-                import asyncio
-                try:
-                    loop = asyncio.get_event_loop()
-                    if loop.is_running():
-                        loop.create_task(self.client.aclose())
-                except RuntimeError:
-                    # No event loop, client will be cleaned up by garbage collection
-                    pass
-        except Exception:
-            pass
\ No newline at end of file
+    async def __aenter__(self) -> "PulseAPIClient":
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        # Shared clients are closed by their owner, not at the end of each use
+        if not self.shared:
+            await self.close()
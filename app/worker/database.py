@@ -3,10 +3,12 @@ Database operations for the extraction worker.
 Handles querying ready intakes, updating statuses, and creating memory records.
 """
 
+import asyncio
 import logging
+import time
 import uuid
 from datetime import datetime, timedelta, timezone
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 from supabase import Client
 from app.core.models import Intake, Memory, MemoryCreate
 from app.core.config import config
@@ -24,6 +26,38 @@ class WorkerDatabase:
             supabase_client: Supabase client instance
         """
         self.client = supabase_client
+        self._stats_cache: Optional[Tuple[float, Dict[str, Any]]] = None  # (fetched_at, stats)
+        # Cleared once PostgREST reports the function missing, so later polls skip straight to the fallback
+        self._claim_rpc_available = True
+        self._stats_rpc_available = True
+    
+    async def _run(self, query):
+        """
+        Execute a Supabase query builder off the event loop.
+        
+        supabase-py is synchronous, so executing inline would block every other
+        coroutine for the full round trip.
+        
+        Args:
+            query: Query builder to execute
+            
+        Returns:
+            The API response
+        """
+        return await asyncio.to_thread(query.execute)
+    
+    @staticmethod
+    def _is_missing_function(error: Exception) -> bool:
+        """
+        Check whether an RPC failed because the database function does not exist.
+        
+        Args:
+            error: Exception raised by the RPC call
+            
+        Returns:
+            True if PostgREST could not find the function
+        """
+        return getattr(error, "code", None) == "PGRST202"
     
     async def get_ready_intakes(self, limit: int = 10) -> List[Dict[str, Any]]:
         """
@@ -39,13 +73,13 @@ class WorkerDatabase:
             current_time = datetime.now(timezone.utc).isoformat()
             
             # Query intakes with status 'ready' and next_retry_at in the past
-            result = self.client.table("intakes").select("*").eq(
+            result = await self._run(self.client.table("intakes").select("*").eq(
                 "status", "ready"
             ).lte(
                 "next_retry_at", current_time
             ).order(
                 "next_retry_at", desc=False
-            ).limit(limit).execute()
+            ).limit(limit))
             
             intakes = result.data or []
             logger.info(f"Found {len(intakes)} ready intakes for processing")
@@ -72,10 +106,10 @@ class WorkerDatabase:
             current_time = datetime.now(timezone.utc).isoformat()
             
             # Atomic update: only update if status is still 'ready'
-            result = self.client.table("intakes").update({
+            result = await self._run(self.client.table("intakes").update({
                 "status": "processing",
                 "updated_at": current_time
-            }).eq("id", intake_id).eq("org_id", org_id).eq("status", "ready").execute()
+            }).eq("id", intake_id).eq("org_id", org_id).eq("status", "ready"))
             
             # Check if any rows were updated
             if result.data and len(result.data) > 0:
@@ -89,6 +123,42 @@ class WorkerDatabase:
             logger.error(f"Error claiming intake {intake_id}: {e}")
             return False
     
+    async def claim_ready_intakes(self, limit: int = 10) -> List[Dict[str, Any]]:
+        """
+        Claim up to `limit` ready intakes for processing in a single round trip.
+        
+        Uses the claim_ready_intakes() database function, which selects and updates
+        the rows with FOR UPDATE SKIP LOCKED so concurrent workers never claim the
+        same intake. Falls back to querying and claiming row by row when the
+        function is not available.
+        
+        Args:
+            limit: Maximum number of intakes to claim
+            
+        Returns:
+            List of claimed intake records (already in 'processing' status)
+        """
+        if self._claim_rpc_available:
+            try:
+                result = await self._run(self.client.rpc("claim_ready_intakes", {"lim": limit}))
+                intakes = result.data or []
+                if intakes:
+                    logger.info(f"Claimed {len(intakes)} ready intakes for processing")
+                return intakes
+                
+            except Exception as e:
+                if self._is_missing_function(e):
+                    self._claim_rpc_available = False
+                    logger.warning(f"claim_ready_intakes() not found, using per-row claims from now on: {e}")
+                else:
+                    logger.warning(f"claim_ready_intakes() failed, falling back to per-row claims: {e}")
+        
+        claimed = []
+        for intake in await self.get_ready_intakes(limit=limit):
+            if await self.claim_intake_for_processing(intake.get("id"), intake.get("org_id")):
+                claimed.append(intake)
+        return claimed
+    
     async def update_intake_status(
         self, 
         intake_id: str, 
@@ -125,7 +195,7 @@ class WorkerDatabase:
             if next_retry_at:
                 update_data["next_retry_at"] = next_retry_at.isoformat()
             
-            result = self.client.table("intakes").update(update_data).eq("id", intake_id).execute()
+            result = await self._run(self.client.table("intakes").update(update_data).eq("id", intake_id))
             
             if result.data:
                 logger.info(f"Updated intake {intake_id} status to {status}")
@@ -196,6 +266,19 @@ class WorkerDatabase:
             logger.error(f"Error scheduling retry for intake {intake_id}: {e}")
             return False
     
+    @staticmethod
+    def _memory_record(memory_data: MemoryCreate) -> Dict[str, Any]:
+        """Build the row inserted into the memories table, with a fresh memory ID."""
+        return {
+            "id": str(uuid.uuid4()),
+            "intake_id": str(memory_data.intake_id),
+            "org_id": memory_data.org_id,
+            "title": memory_data.title,
+            "summary": memory_data.summary,
+            "metadata": memory_data.metadata,
+            "created_at": datetime.now(timezone.utc).isoformat()
+        }
+    
     async def create_memory(self, memory_data: MemoryCreate) -> Optional[str]:
         """
         Create a new memory record from processed intake.
@@ -207,19 +290,10 @@ class WorkerDatabase:
             Memory ID if successful, None otherwise
         """
         try:
-            memory_id = str(uuid.uuid4())
-            
-            memory_record = {
-                "id": memory_id,
-                "intake_id": str(memory_data.intake_id),
-                "org_id": memory_data.org_id,
-                "title": memory_data.title,
-                "summary": memory_data.summary,
-                "metadata": memory_data.metadata,
-                "created_at": datetime.now(timezone.utc).isoformat()
-            }
+            memory_record = self._memory_record(memory_data)
+            memory_id = memory_record["id"]
             
-            result = self.client.table("memories").insert(memory_record).execute()
+            result = await self._run(self.client.table("memories").insert(memory_record))
             
             if result.data:
                 logger.info(f"Created memory {memory_id} for intake {memory_data.intake_id}")
@@ -232,6 +306,34 @@ class WorkerDatabase:
             logger.error(f"Error creating memory for intake {memory_data.intake_id}: {e}")
             return None
     
+    async def create_memories_bulk(self, memories: List[MemoryCreate]) -> Optional[List[str]]:
+        """
+        Create several memory records with a single multi-row insert.
+        
+        The insert is atomic: either every record is created or none is.
+        
+        Args:
+            memories: Memory creation data, one entry per processed intake
+            
+        Returns:
+            Memory IDs in the same order as `memories` if successful, None otherwise
+        """
+        try:
+            memory_records = [self._memory_record(memory_data) for memory_data in memories]
+            
+            result = await self._run(self.client.table("memories").insert(memory_records))
+            
+            if result.data:
+                logger.info(f"Created {len(memory_records)} memories in one batch")
+                return [record["id"] for record in memory_records]
+            else:
+                logger.error(f"Failed to create batch of {len(memory_records)} memories")
+                return None
+                
+        except Exception as e:
+            logger.error(f"Error creating batch of {len(memories)} memories: {e}")
+            return None
+    
     async def get_intake_details(self, intake_id: str, org_id: str) -> Optional[Dict[str, Any]]:
         """
         Get detailed information about a specific intake.
@@ -244,9 +346,9 @@ class WorkerDatabase:
             Intake details if found, None otherwise
         """
         try:
-            result = self.client.table("intakes").select("*").eq(
+            result = await self._run(self.client.table("intakes").select("*").eq(
                 "id", intake_id
-            ).eq("org_id", org_id).execute()
+            ).eq("org_id", org_id))
             
             if result.data and len(result.data) > 0:
                 return result.data[0]
@@ -262,31 +364,66 @@ class WorkerDatabase:
         """
         Get statistics about worker processing status.
         
+        Uses the worker_stats() database function so all counts come back in a
+        single round trip. Results are cached for config.worker_stats_ttl_seconds.
+        
         Returns:
             Dictionary with worker statistics
         """
+        now = time.monotonic()
+        if self._stats_cache and now - self._stats_cache[0] < config.worker_stats_ttl_seconds:
+            return self._stats_cache[1]
+        
         try:
-            stats = {}
-            
-            # Count intakes by status
-            for status in ["ready", "processing", "done", "failed_max_attempts"]:
-                result = self.client.table("intakes").select("id", count="exact").eq("status", status).execute()
-                stats[f"{status}_count"] = result.count or 0
+            stats = None
+            if self._stats_rpc_available:
+                try:
+                    result = await self._run(self.client.rpc("worker_stats"))
+                    row = result.data[0] if isinstance(result.data, list) else result.data
+                    stats = {key: value or 0 for key, value in (row or {}).items()}
+                except Exception as e:
+                    if self._is_missing_function(e):
+                        self._stats_rpc_available = False
+                        logger.warning(f"worker_stats() not found, using per-status counts from now on: {e}")
+                    else:
+                        logger.warning(f"worker_stats() failed, falling back to per-status counts: {e}")
             
-            # Count recent errors (last 24 hours)
-            yesterday = (datetime.now(timezone.utc) - timedelta(days=1)).isoformat()
-            error_result = self.client.table("intakes").select("id", count="exact").neq(
-                "last_error", None
-            ).gte("updated_at", yesterday).execute()
-            stats["recent_errors_count"] = error_result.count or 0
-            
-            # Count total memories created
-            memory_result = self.client.table("memories").select("id", count="exact").execute()
-            stats["total_memories_count"] = memory_result.count or 0
+            if stats is None:
+                stats = await self._count_worker_stats()
             
+            self._stats_cache = (now, stats)
             logger.debug(f"Worker stats: {stats}")
             return stats
             
         except Exception as e:
             logger.error(f"Error fetching worker stats: {e}")
             return {"error": str(e)}
+    
+    async def _count_worker_stats(self) -> Dict[str, Any]:
+        """
+        Compute worker statistics with one count query per figure.
+        
+        Fallback for databases where the worker_stats() function has not been created yet.
+        
+        Returns:
+            Dictionary with worker statistics
+        """
+        stats = {}
+        
+        # Count intakes by status
+        for status in ["ready", "processing", "done", "failed_max_attempts"]:
+            result = await self._run(self.client.table("intakes").select("id", count="exact").eq("status", status))
+            stats[f"{status}_count"] = result.count or 0
+        
+        # Count recent errors (last 24 hours)
+        yesterday = (datetime.now(timezone.utc) - timedelta(days=1)).isoformat()
+        error_result = await self._run(self.client.table("intakes").select("id", count="exact").neq(
+            "last_error", None
+        ).gte("updated_at", yesterday))
+        stats["recent_errors_count"] = error_result.count or 0
+        
+        # Count total memories created
+        memory_result = await self._run(self.client.table("memories").select("id", count="exact"))
+        stats["total_memories_count"] = memory_result.count or 0
+        
+        return stats
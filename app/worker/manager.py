@@ -5,76 +5,67 @@ Handles starting, stopping, and managing the extraction worker.
 
 import asyncio
 import logging
-import threading
-import atexit
 from typing import Optional
 
-from app.worker.service import ExtractionWorker
+from app.worker.service import WORKER_STOP_TIMEOUT, ExtractionWorker
 from app.core.config import config
 
 logger = logging.getLogger(__name__)
 
-# Global worker state
+# Global worker state; the only worker instance in the process
 _worker_instance: Optional[ExtractionWorker] = None
-_worker_thread: Optional[threading.Thread] = None
-_worker_stopped = False
+_worker_task: Optional[asyncio.Task] = None
 
 def get_worker_instance() -> Optional[ExtractionWorker]:
     """Get the current worker instance."""
     global _worker_instance
     return _worker_instance
 
-def start_worker() -> bool:
+async def start_worker() -> bool:
     """
-    Start the extraction worker in a background thread.
+    Start the extraction worker as a task on the running event loop.
+    
+    Must be called from the application's event loop (e.g. a FastAPI startup hook).
     
     Returns:
         True if worker was started, False if already running
     """
-    global _worker_instance, _worker_thread, _worker_stopped
+    global _worker_instance, _worker_task
     
-    if _worker_instance and _worker_instance.is_running:
+    if _worker_task and not _worker_task.done():
         logger.info("Worker is already running")
         return False
     
-    # Reset stopped flag
-    _worker_stopped = False
-    
     # Create new worker instance using configuration
     _worker_instance = ExtractionWorker(
         polling_interval=config.worker_polling_interval,
         max_concurrent_jobs=config.worker_max_concurrent_jobs
     )
-    
-    def run_worker():
-        """Run the worker in the thread."""
-        try:
-            asyncio.run(_worker_instance.start())
-        except KeyboardInterrupt:
-            logger.info("Worker received keyboard interrupt")
-        except Exception as e:
-            logger.error(f"Worker crashed: {e}", exc_info=True)
-    
-    # Start worker in daemon thread
-    _worker_thread = threading.Thread(target=run_worker, daemon=True)
-    _worker_thread.start()
+    _worker_task = asyncio.create_task(_worker_instance.start())
     
     logger.info("✅ Background worker started")
     return True
 
-def stop_worker():
-    """Stop the extraction worker."""
-    global _worker_instance, _worker_stopped
+async def stop_worker():
+    """Stop the extraction worker and wait for it to wind down."""
+    global _worker_task
     
-    if _worker_instance and not _worker_stopped:
-        logger.info("🛑 Stopping background worker...")
-        _worker_instance.stop()
-        _worker_stopped = True
-        logger.info("✅ Background worker stopped")
-    elif _worker_stopped:
+    if not _worker_task or _worker_task.done():
         logger.debug("Worker already stopped, skipping")
+        return
+    
+    logger.info("🛑 Stopping background worker...")
+    _worker_instance.stop()
+    try:
+        # wait_for cancels the task if it does not stop in time
+        await asyncio.wait_for(_worker_task, timeout=WORKER_STOP_TIMEOUT)
+    except (asyncio.TimeoutError, asyncio.CancelledError):
+        logger.warning("Worker did not stop gracefully, cancelled")
+    finally:
+        _worker_task = None
+    logger.info("✅ Background worker stopped")
 
-def restart_worker() -> bool:
+async def restart_worker() -> bool:
     """
     Restart the worker.
     
@@ -82,13 +73,8 @@ def restart_worker() -> bool:
         True if worker was restarted successfully
     """
     logger.info("Restarting worker...")
-    stop_worker()
-    
-    # Give it a moment to stop
-    import time
-    time.sleep(1)
-    
-    return start_worker()
+    await stop_worker()
+    return await start_worker()
 
 def is_worker_running() -> bool:
     """Check if the worker is currently running."""
@@ -115,22 +101,8 @@ def get_worker_stats() -> dict:
             "active_jobs": len(_worker_instance.active_jobs) if hasattr(_worker_instance, 'active_jobs') else 0
         }
     except Exception as e:
-        logger.error(f"Error getting worker stats: {e}")
+        logger.error("Error getting worker stats: %s", e)
         return {
             "status": "error",
             "error": str(e)
         }
-
-# Register cleanup function to stop worker on exit
-atexit.register(stop_worker)
-
-# Auto-start worker when module is imported
-def _auto_start_worker():
-    """Auto-start the worker when the module is imported."""
-    try:
-        start_worker()
-    except Exception as e:
-        logger.error(f"Failed to auto-start worker: {e}")
-
-# Start worker automatically
-_auto_start_worker()
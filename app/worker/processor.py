@@ -3,8 +3,10 @@ Processing orchestrator for the extraction worker.
 Coordinates the full processing pipeline for intakes.
 """
 
+import asyncio
 import logging
-from typing import Dict, Any, Optional
+import time
+from typing import Dict, Any, List, Optional, Tuple
 from uuid import UUID
 from supabase import Client
 
@@ -16,21 +18,234 @@ from app.worker.storage import WorkerStorage
 
 logger = logging.getLogger(__name__)
 
+TENANT_CACHE_TTL = 300  # seconds
+MEMORY_BATCH_SIZE = 50
+MEMORY_FLUSH_INTERVAL = 0.25  # seconds
+# Queued by stop_memory_flusher: flush everything ahead of it, then exit
+_FLUSHER_STOP = object()
+
 class IntakeProcessor:
     """Orchestrates the complete processing pipeline for a single intake."""
     
-    def __init__(self, supabase_client: Client):
+    def __init__(self, supabase_client: Client, config: Config):
         """
         Initialize the intake processor.
         
         Args:
             supabase_client: Supabase client instance
+            config: Configuration shared with the owning worker
         """
         self.client = supabase_client
         self.db = WorkerDatabase(supabase_client)
-        self.storage = WorkerStorage(supabase_client)
-        self.config = Config()
-        self.pulse_api_client = None
+        self.storage = WorkerStorage()
+        self.config = config
+        # One long-lived client per org so connections and TLS sessions are reused across intakes
+        self._pulse_clients: Dict[str, PulseAPIClient] = {}
+        # Orgs whose tenant configuration loaded: {org_id: (loaded_at, org_name)}
+        self._tenant_cache: Dict[str, Tuple[float, str]] = {}
+        # Write-behind queue of (memory_data, future resolved with the memory ID)
+        self._memory_queue: asyncio.Queue = asyncio.Queue()
+        self._memory_flusher_task: Optional[asyncio.Task] = None
+    
+    async def preload_tenants(self):
+        """
+        Load tenant configuration for every active org up front.
+        
+        Preloaded orgs share the tenant cache and its TTL, so a deactivated org or a
+        rotated secret is picked up on the next lazy load; orgs added later are loaded
+        lazily by `_load_tenant`.
+        """
+        orgs_resp = await asyncio.to_thread(
+            self.client.table("orgs").select("org_name").eq("status", "active").execute
+        )
+        org_names = [row["org_name"] for row in orgs_resp.data or []]
+        
+        loaded = await asyncio.to_thread(self.config.preload_tenant_secrets, org_names)
+        now = time.monotonic()
+        for org_id, org_name in loaded.items():
+            self._tenant_cache[org_id] = (now, org_name)
+    
+    async def _load_tenant(self, org_id: str) -> Optional[str]:
+        """
+        Resolve the org name and load its tenant secrets.
+        
+        Results (preloaded or not) are cached for TENANT_CACHE_TTL. Failures are not
+        cached so a retried intake tries again.
+        
+        Args:
+            org_id: Organization ID of the intake
+            
+        Returns:
+            Organization name if the tenant configuration is loaded, None otherwise
+        """
+        now = time.monotonic()
+        entry = self._tenant_cache.get(org_id)
+        if entry and now - entry[0] < TENANT_CACHE_TTL:
+            return entry[1]
+        
+        org_resp = await asyncio.to_thread(
+            self.client.table("orgs").select("org_name").eq("id", org_id).execute
+        )
+        
+        if not org_resp.data:
+            raise ValueError(f"Organization {org_id} not found")
+        
+        org_name = org_resp.data[0]["org_name"]
+        
+        # Returns the result instead of storing it on the config, which other loads share
+        if await asyncio.to_thread(self.config.resolve_tenant_secrets, org_name) is None:
+            return None
+        
+        self._tenant_cache[org_id] = (now, org_name)
+        return org_name
+    
+    async def _get_pulse_client(self, org_id: str, org_name: str) -> PulseAPIClient:
+        """
+        Get the cached pulse API client for an org, creating it on first use.
+        
+        Args:
+            org_id: Organization ID (cache key)
+            org_name: Organization name sent to the pulse API
+            
+        Returns:
+            PulseAPIClient for the org
+        """
+        client = self._pulse_clients.get(org_id)
+        if client is not None:
+            return client
+        
+        pulse_config = self.config.get_pulse_api_config()
+        # The org ID is already known, so skip the name lookup `PulseAPIClient.create` does;
+        # with no await before the insert, concurrent intakes cannot create duplicates
+        client = PulseAPIClient(
+            base_url=pulse_config["base_url"],
+            org_name=org_name,
+            org_id=org_id,
+            max_connections=self.config.worker_max_concurrent_jobs,
+            shared=True
+        )
+        self._pulse_clients[org_id] = client
+        return client
+    
+    def start_memory_flusher(self):
+        """Start batching memory inserts; until then each memory is inserted on its own."""
+        if self._memory_flusher_task is None or self._memory_flusher_task.done():
+            self._memory_flusher_task = asyncio.create_task(self._memory_flusher())
+    
+    async def stop_memory_flusher(self, timeout: float):
+        """
+        Stop the memory flusher once everything already queued has been inserted.
+        
+        Memories created from now on are inserted directly. If draining takes longer
+        than `timeout` the flusher is cancelled; its waiting jobs then get None, like
+        a failed insert.
+        
+        Args:
+            timeout: Seconds to let the flusher drain the queue
+        """
+        task, self._memory_flusher_task = self._memory_flusher_task, None
+        if task is not None and not task.done():
+            self._memory_queue.put_nowait(_FLUSHER_STOP)
+            try:
+                await asyncio.wait_for(task, timeout=timeout)
+            except asyncio.TimeoutError:
+                logger.warning("Memory flusher did not drain in time, cancelled")
+        
+        while not self._memory_queue.empty():
+            item = self._memory_queue.get_nowait()
+            if item is not _FLUSHER_STOP and not item[1].done():
+                item[1].set_result(None)
+    
+    async def _create_memory(self, memory_data: MemoryCreate) -> Optional[str]:
+        """
+        Create a memory record, batched with other jobs' records when the flusher is running.
+        
+        Args:
+            memory_data: Memory creation data
+            
+        Returns:
+            Memory ID if successful, None otherwise
+        """
+        if self._memory_flusher_task is None or self._memory_flusher_task.done():
+            return await self.db.create_memory(memory_data)
+        
+        future = asyncio.get_running_loop().create_future()
+        self._memory_queue.put_nowait((memory_data, future))
+        return await future
+    
+    async def _memory_flusher(self):
+        """
+        Insert queued memories in batches of up to MEMORY_BATCH_SIZE every MEMORY_FLUSH_INTERVAL.
+        
+        Runs until it takes the stop marker off the queue, after flushing the batch in hand.
+        """
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            batch = []
+            item = await self._memory_queue.get()
+            deadline = loop.time() + MEMORY_FLUSH_INTERVAL
+            
+            while True:
+                if item is _FLUSHER_STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+                timeout = deadline - loop.time()
+                if len(batch) >= MEMORY_BATCH_SIZE or timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._memory_queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+            
+            try:
+                if batch:
+                    await self._flush_memories(batch)
+            finally:
+                # Never leave a job waiting, even if the flush failed or was cancelled
+                for _, future in batch:
+                    if not future.done():
+                        future.set_result(None)
+    
+    async def _flush_memories(self, batch: List[Tuple[MemoryCreate, asyncio.Future]]):
+        """Insert one batch and hand each waiting job its memory ID (None if the insert failed)."""
+        # A cancelled job's intake stays 'processing' and is re-extracted when reclaimed,
+        # so inserting its memory would leave an orphan row and later a duplicate
+        batch = [item for item in batch if not item[1].cancelled()]
+        if not batch:
+            return
+        
+        memory_ids = await self.db.create_memories_bulk([memory_data for memory_data, _ in batch])
+        
+        for index, (_, future) in enumerate(batch):
+            if not future.done():
+                future.set_result(memory_ids[index] if memory_ids else None)
+    
+    async def close_all(self, flush_timeout: float):
+        """
+        Stop the memory flusher and close every cached pulse API client and the storage stream client.
+        
+        The clients are closed even if draining the flusher is cancelled.
+        
+        Args:
+            flush_timeout: Seconds to let the memory flusher drain its queue
+        """
+        try:
+            await self.stop_memory_flusher(flush_timeout)
+        finally:
+            try:
+                await self.storage.close()
+            except Exception as e:
+                logger.warning(f"Error closing storage client: {e}")
+            
+            clients = list(self._pulse_clients.values())
+            self._pulse_clients.clear()
+            for client in clients:
+                try:
+                    await client.close()
+                except Exception as e:
+                    logger.warning(f"Error closing pulse API client: {e}")
     
     async def process_intake(self, intake_data: Dict[str, Any]) -> bool:
         """
@@ -56,47 +271,35 @@ class IntakeProcessor:
             config_org_id = self.config.default_org_id or org_id
             logger.info(f"Loading tenant configuration for org {config_org_id}")
             
-            org_resp = (
-            self.client
-            .table("orgs")
-            .select("org_name")
-            .eq("id", org_id)
-            .execute()
-            )
-
-            from fastapi import HTTPException
-            
-            if not org_resp.data:
-                raise HTTPException(status_code=404, detail="Organization not found")
-
-            x_org_name = org_resp.data[0]["org_name"]   
+            x_org_name = await self._load_tenant(org_id)
             
-            if not self.config.load_tenant_secrets(x_org_name):
+            if x_org_name is None:
                 error_msg = f"Failed to load tenant configuration for org {config_org_id}"
                 logger.error(error_msg)
                 await self.db.schedule_retry(intake_id, attempts, error_msg)
                 return False
             
-            # Step 2: Download and verify content
-            logger.info(f"Downloading content from storage path: {storage_path}")
-            content = await self.storage.download_and_verify(storage_path, checksum)
+            # Step 2: Locate content (it is streamed and verified during extraction)
+            # Intakes finalized before object keys were recorded need a storage listing
+            object_path = intake_data.get("object_key")
+            if object_path is None:
+                logger.info(f"Locating content in storage path: {storage_path}")
+                object_path = await self.storage.get_object_path(storage_path)
             
-            if content is None:
-                error_msg = f"Failed to download or verify content from {storage_path}"
+            if object_path is None:
+                error_msg = f"Failed to locate content in {storage_path}"
                 logger.error(error_msg)
                 await self.db.schedule_retry(intake_id, attempts, error_msg)
                 return False
             
-            logger.info(f"Successfully downloaded {len(content)} characters of content")
+            # Checksum was computed over the same bytes at finalize, so once the stream
+            # verifies it the recorded size is exact
+            content_length = intake_data.get("size_bytes")
             
-            # Step 3: Initialize pulse API client
-            logger.info("Initializing pulse API client")
+            # Step 3: Get pulse API client
+            logger.info("Getting pulse API client")
             try:
-                pulse_config = self.config.get_pulse_api_config()
-                self.pulse_api_client = PulseAPIClient(
-                    base_url=pulse_config["base_url"],
-                    org_name=x_org_name 
-                )
+                pulse_api_client = await self._get_pulse_client(org_id, x_org_name)
             except Exception as e:
                 error_msg = f"Failed to initialize pulse API client: {str(e)}"
                 logger.error(error_msg)
@@ -106,10 +309,11 @@ class IntakeProcessor:
             # Step 4: Process content with pulse API
             logger.info("Processing content with pulse extraction API")
             try:
-                if not self.pulse_api_client:
-                    raise ValueError("Pulse API client not initialized")
-                
-                extraction_result = await self.pulse_api_client.extract_content(content, intake_id=intake_id)
+                async with pulse_api_client:
+                    extraction_result = await pulse_api_client.extract_content_stream(
+                        lambda: self.storage.open_stream(object_path, checksum),
+                        intake_id=intake_id
+                    )
                 if extraction_result is None:
                     raise ValueError("Extraction API returned no result")
                 
@@ -149,7 +353,7 @@ class IntakeProcessor:
             
             # Extract information from pulse API response
             title = f"Document from {storage_path}"  # Default title
-            summary = f"Processed document with {len(content)} characters"
+            summary = f"Processed document with {content_length} bytes"
             
             # Try to get more specific info from the API response
             if extraction_result and isinstance(extraction_result, dict):
@@ -169,7 +373,7 @@ class IntakeProcessor:
                 metadata={
                     "extraction_result": extraction_result,
                     "processing_stats": {
-                        "content_length": len(content),
+                        "content_length": content_length,
                         "processing_attempts": attempts + 1,
                         "storage_path": storage_path,
                         "checksum": checksum,
@@ -178,7 +382,8 @@ class IntakeProcessor:
                 }
             )
             
-            memory_id = await self.db.create_memory(memory_data)
+            # A failed batch resolves to None here, so every intake in it is retried
+            memory_id = await self._create_memory(memory_data)
             
             if memory_id is None:
                 error_msg = "Failed to create memory record"
@@ -204,16 +409,6 @@ class IntakeProcessor:
             logger.error(error_msg, exc_info=True)
             await self.db.schedule_retry(intake_id, attempts, error_msg)
             return False
-        
-        finally:
-            # Clean up pulse API client
-            if hasattr(self, 'pulse_api_client') and self.pulse_api_client is not None:
-                try:
-                    await self.pulse_api_client.close()
-                    self.pulse_api_client = None  # Reset to None after closing
-                except Exception as e:
-                    logger.warning(f"Error closing pulse API client: {e}")
-                    self.pulse_api_client = None  # Reset even on error
     
     async def get_processing_summary(self, intake_id: str) -> Dict[str, Any]:
         """
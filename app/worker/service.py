@@ -4,19 +4,32 @@ Polls for ready intakes and processes them using the extraction pipeline.
 """
 
 import asyncio
+import collections
 import logging
-import signal
 import os
+import time
 from typing import Optional
 from datetime import datetime, timezone
-from supabase import create_client, Client
+from supabase import acreate_client, Client
 
 from app.worker.database import WorkerDatabase
 from app.worker.processor import IntakeProcessor
-from app.core.config import config
+from app.core.config import config, get_shared_supabase_client
 
 logger = logging.getLogger(__name__)
 
+# Seconds stop_worker waits for a graceful stop before cancelling the worker task
+WORKER_STOP_TIMEOUT = 15.0
+# Seconds cancelled in-flight jobs get to finish on stop
+JOB_CANCEL_TIMEOUT = 10.0
+# Rest of the stop budget, less a margin for releasing prefetched intakes and closing
+# clients, so queued memory inserts drain before stop_worker cancels the worker task
+MEMORY_FLUSH_STOP_TIMEOUT = WORKER_STOP_TIMEOUT - JOB_CANCEL_TIMEOUT - 2.0
+
+WORKER_STATS_LOG_FORMAT = (
+    "📊 Worker Stats - Ready: %s, Processing: %s, Processed: %d, Failed: %d, Errors: %d, Active Jobs: %d"
+)
+
 class ExtractionWorker:
     """Main worker service for processing intakes."""
     
@@ -32,12 +45,28 @@ class ExtractionWorker:
         Args:
             polling_interval: How often to poll for new intakes (seconds)
             max_concurrent_jobs: Maximum number of concurrent processing jobs
-            supabase_client: Optional Supabase client (creates new one if None)
+            supabase_client: Optional Supabase client (uses the shared one if None)
         """
         self.polling_interval = polling_interval
         self.max_concurrent_jobs = max_concurrent_jobs
         self.is_running = False
         self.active_jobs = set()
+        # One permit per concurrent job; released when the job's task finishes
+        self._slots = asyncio.Semaphore(max_concurrent_jobs)
+        # Intakes claimed ahead of time so a freed slot is filled without waiting on the database
+        self._prefetched: asyncio.Queue = asyncio.Queue()
+        # One permit per prefetch buffer entry; caps how many claimed intakes can wait unstarted
+        self._prefetch_room = asyncio.Semaphore(max_concurrent_jobs)
+        # Outcomes of intakes processed by this worker since it was created
+        self._counters = collections.Counter()
+        
+        # Set whenever an intake becomes ready to wake the main loop early
+        self._wakeup = asyncio.Event()
+        # Set by stop(); every wait in the main loop also returns as soon as it is set
+        self._stop_event = asyncio.Event()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._realtime_client = None
+        self._realtime_channel = None
         
         # Initialize Supabase client
         if supabase_client:
@@ -45,30 +74,14 @@ class ExtractionWorker:
         else:
             supabase_url = os.getenv("SUPABASE_URL")
             supabase_key = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
-            self.client = create_client(supabase_url, supabase_key)
+            self.client = get_shared_supabase_client(supabase_url, supabase_key)
         
         # Initialize components
+        # The processor only uses Config's non-mutating tenant lookups, so it can share the singleton
         self.db = WorkerDatabase(self.client)
-        self.processor = IntakeProcessor(self.client)
-        
-        # Set up signal handlers for graceful shutdown
-        self._setup_signal_handlers()
-        
-        logger.info(f"✅ Extraction worker initialized (polling: {polling_interval}s, max_concurrent: {max_concurrent_jobs})")
-    
-    def _setup_signal_handlers(self):
-        """Set up signal handlers for graceful shutdown."""
-        def signal_handler(signum, frame):
-            logger.info(f"Received signal {signum}, initiating graceful shutdown...")
-            self.stop()
+        self.processor = IntakeProcessor(self.client, config)
         
-        # Only set up signal handlers if we're in the main thread
-        try:
-            signal.signal(signal.SIGTERM, signal_handler)
-            signal.signal(signal.SIGINT, signal_handler)
-        except ValueError:
-            # Signal handlers can only be set from main thread
-            logger.debug("Signal handlers not set (not in main thread)")
+        logger.info("✅ Extraction worker initialized (polling: %ss, max_concurrent: %d)", polling_interval, max_concurrent_jobs)
     
     async def start(self):
         """Start the worker service."""
@@ -77,123 +90,230 @@ class ExtractionWorker:
             return
         
         self.is_running = True
+        self._loop = asyncio.get_running_loop()
+        self._stop_event.clear()
         logger.info("🚀 Starting extraction worker service")
         
         try:
+            await self._subscribe_to_ready_intakes()
+            await self._preload_tenants()
+            self.processor.start_memory_flusher()
             await self._main_loop()
         except asyncio.CancelledError:
             logger.info("Worker main loop cancelled")
             raise  # Re-raise to properly propagate cancellation
         except Exception as e:
-            logger.error(f"❌ Worker main loop crashed: {e}", exc_info=True)
+            logger.error("❌ Worker main loop crashed: %s", e, exc_info=True)
         finally:
             self.is_running = False
+            try:
+                await self._unsubscribe_from_ready_intakes()
+            finally:
+                await self.processor.close_all(MEMORY_FLUSH_STOP_TIMEOUT)
             logger.info("🛑 Extraction worker service stopped")
     
     def stop(self):
         """Stop the worker service."""
         logger.info("Stopping extraction worker service...")
         self.is_running = False
+        if self._loop and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._stop_event.set)
+    
+    async def _subscribe_to_ready_intakes(self):
+        """
+        Subscribe to Supabase Realtime changes on intakes becoming ready.
+        
+        Each notification sets the wakeup event so the main loop claims new work
+        immediately instead of waiting out the polling interval. If Realtime is not
+        available the worker keeps working on polling alone.
+        """
+        try:
+            self._realtime_client = await acreate_client(
+                os.getenv("SUPABASE_URL"),
+                os.getenv("SUPABASE_SERVICE_ROLE_KEY")
+            )
+            channel = self._realtime_client.channel("worker-intakes-ready")
+            channel.on_postgres_changes(
+                "*",
+                schema="public",
+                table="intakes",
+                filter="status=eq.ready",
+                callback=lambda payload: self._wakeup.set()
+            )
+            await channel.subscribe()
+            self._realtime_channel = channel
+            logger.info("✅ Subscribed to ready intake notifications")
+        except Exception as e:
+            logger.warning("Realtime subscription unavailable, relying on polling only: %s", e)
+    
+    async def _unsubscribe_from_ready_intakes(self):
+        """Tear down the Realtime subscription, if any."""
+        if self._realtime_client and self._realtime_channel:
+            try:
+                await self._realtime_client.remove_channel(self._realtime_channel)
+            except Exception as e:
+                logger.warning("Error removing realtime channel: %s", e)
+        self._realtime_channel = None
+        self._realtime_client = None
+    
+    async def _preload_tenants(self):
+        """Warm the processor's tenant cache; failures only mean lazy loading per org."""
+        try:
+            await self.processor.preload_tenants()
+        except Exception as e:
+            logger.warning("Failed to preload tenant configuration: %s", e)
+    
+    async def _until_stopped(self, awaitable, timeout: Optional[float] = None) -> bool:
+        """
+        Await something unless the worker is stopped (or the timeout elapses) first.
+        
+        Args:
+            awaitable: Coroutine or future to wait for
+            timeout: Maximum time to wait in seconds (None waits indefinitely)
+            
+        Returns:
+            True if the awaitable completed, False if stopped or timed out
+        """
+        task = asyncio.ensure_future(awaitable)
+        stopped = asyncio.ensure_future(self._stop_event.wait())
+        try:
+            await asyncio.wait({task, stopped}, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            stopped.cancel()
+            if not task.done():
+                task.cancel()
+        return task.done() and not task.cancelled()
+    
+    async def _wait_for_wakeup(self, timeout: float):
+        """Wait until an intake becomes ready, the worker is stopped, or the timeout elapses."""
+        await self._until_stopped(self._wakeup.wait(), timeout=timeout)
+        self._wakeup.clear()
+    
+    async def _acquire_unless_stopped(self, semaphore: asyncio.Semaphore) -> bool:
+        """
+        Wait for a semaphore permit.
+        
+        Args:
+            semaphore: Semaphore to acquire
+            
+        Returns:
+            True once a permit is held, False if the worker was stopped while waiting
+        """
+        acquired = await self._until_stopped(semaphore.acquire())
+        if acquired and self._stop_event.is_set():
+            semaphore.release()
+            return False
+        return acquired
     
     async def _main_loop(self):
-        """Main worker loop that polls for intakes and processes them."""
-        last_stats_log = datetime.now(timezone.utc)
+        """
+        Main worker loop that claims intakes and processes them.
+        
+        Claiming and dispatching run concurrently: the fetcher keeps a buffer of claimed
+        intakes topped up while the dispatcher starts one as soon as a job slot frees up.
+        """
         stats_log_interval = config.worker_stats_log_interval
         
         try:
-            while self.is_running:
-                try:
-                    # Log stats periodically
-                    now = datetime.now(timezone.utc)
-                    if (now - last_stats_log).total_seconds() > stats_log_interval:
+            # The task group owns every in-flight job; leaving it waits for them all
+            async with asyncio.TaskGroup() as tg:
+                fetcher = tg.create_task(self._fetch_ready_intakes())
+                dispatcher = tg.create_task(self._dispatch_intakes(tg))
+                
+                # Log stats periodically until stopped
+                while self.is_running:
+                    if await self._until_stopped(asyncio.sleep(stats_log_interval)):
                         await self._log_worker_stats()
-                        last_stats_log = now
-                    
-                    # Clean up completed jobs
-                    self._cleanup_completed_jobs()
-                    
-                    # Check if we should still be running
-                    if not self.is_running:
-                        break
-                    
-                    # Check if we can process more intakes
-                    if len(self.active_jobs) >= self.max_concurrent_jobs:
-                        logger.debug(f"At max concurrent jobs ({self.max_concurrent_jobs}), waiting...")
-                        # Use shorter sleep when at max capacity to check shutdown more frequently
-                        for _ in range(min(self.polling_interval, 5)):
-                            if not self.is_running:
-                                break
-                            await asyncio.sleep(1)
-                        continue
-                    
-                    # Query for ready intakes
-                    ready_intakes = await self.db.get_ready_intakes(
-                        limit=self.max_concurrent_jobs - len(self.active_jobs)
-                    )
-                    
-                    if not ready_intakes:
-                        logger.debug("No ready intakes found, waiting...")
-                        # Use shorter sleep to check shutdown more frequently
-                        for _ in range(min(self.polling_interval, 5)):
-                            if not self.is_running:
-                                break
-                            await asyncio.sleep(1)
-                        continue
-                    
-                    # Process each ready intake
-                    for intake in ready_intakes:
-                        if not self.is_running:  # Check if we should stop
-                            break
-                            
-                        if len(self.active_jobs) >= self.max_concurrent_jobs:
-                            break
-                        
-                        # Try to claim the intake for processing
-                        intake_id = intake.get("id")
-                        org_id = intake.get("org_id")
-                        
-                        if await self.db.claim_intake_for_processing(intake_id, org_id):
-                            # Successfully claimed, start processing
-                            task = asyncio.create_task(self._process_intake_safely(intake))
-                            self.active_jobs.add(task)
-                            logger.info(f"Started processing intake {intake_id} (active jobs: {len(self.active_jobs)})")
-                        else:
-                            logger.debug(f"Failed to claim intake {intake_id} - already claimed by another worker")
-                    
-                    # Short sleep but check for shutdown
-                    if self.is_running:
-                        await asyncio.sleep(1)
-                    
-                except asyncio.CancelledError:
-                    logger.info("Main loop cancelled, shutting down...")
-                    self.is_running = False
-                    raise  # Re-raise to propagate cancellation
-                except Exception as e:
-                    logger.error(f"Error in worker main loop: {e}", exc_info=True)
-                    # Use shorter sleep on error to check shutdown more frequently
-                    for _ in range(min(self.polling_interval, 5)):
-                        if not self.is_running:
-                            break
-                        await asyncio.sleep(1)
+                
+                # The fetcher exits on its own so a claim is never abandoned mid-flight
+                await fetcher
+                dispatcher.cancel()
+                
+                # Stopped: cancel in-flight jobs so the task group does not wait on them
+                await self._cancel_active_jobs()
+        
+        except asyncio.CancelledError:
+            logger.info("Main loop cancelled, shutting down...")
+            self.is_running = False
+            raise  # Re-raise to propagate cancellation
         
         finally:
-            # Clean up active jobs on shutdown
-            logger.info("Cancelling active jobs...")
-            for job in self.active_jobs:
-                if not job.done():
-                    job.cancel()
-            
-            # Wait for jobs to finish with timeout
-            if self.active_jobs:
+            await self._release_prefetched()
+            logger.info("Worker main loop cleanup complete")
+    
+    async def _fetch_ready_intakes(self):
+        """Claim ready intakes into the prefetch buffer until the worker stops."""
+        while self.is_running:
+            try:
+                # Block until the buffer has room
+                if not await self._acquire_unless_stopped(self._prefetch_room):
+                    break
+                
+                # Take whatever other room is free too, to claim it all in one round trip
+                reserved = 1
+                while reserved < self.max_concurrent_jobs and not self._prefetch_room.locked():
+                    await self._prefetch_room.acquire()
+                    reserved += 1
+                
+                claimed_intakes = []
                 try:
-                    await asyncio.wait_for(
-                        asyncio.gather(*self.active_jobs, return_exceptions=True), 
-                        timeout=10.0
-                    )
-                except asyncio.TimeoutError:
-                    logger.warning("Some jobs didn't finish within timeout")
+                    claimed_intakes = await self.db.claim_ready_intakes(limit=reserved)
+                finally:
+                    for _ in range(reserved - len(claimed_intakes)):
+                        self._prefetch_room.release()
+                
+                for intake in claimed_intakes:
+                    self._prefetched.put_nowait(intake)
+                
+                if not claimed_intakes:
+                    logger.debug("No ready intakes found, waiting...")
+                    # Polling interval is only a fallback for missed notifications
+                    await self._wait_for_wakeup(self.polling_interval)
+                
+            except Exception as e:
+                logger.error("Error claiming ready intakes: %s", e, exc_info=True)
+                # Back off briefly, but wake immediately on shutdown
+                await self._until_stopped(asyncio.sleep(min(self.polling_interval, 5)))
+    
+    async def _dispatch_intakes(self, tg: asyncio.TaskGroup):
+        """Start a job for each prefetched intake as job slots free up; runs until cancelled."""
+        while True:
+            await self._slots.acquire()
+            try:
+                intake = await self._prefetched.get()
+            except asyncio.CancelledError:
+                self._slots.release()
+                raise
+            self._prefetch_room.release()
             
-            logger.info("Worker main loop cleanup complete")
+            task = tg.create_task(self._process_intake_safely(intake))
+            task.add_done_callback(lambda _task: self._slots.release())
+            task.add_done_callback(self.active_jobs.discard)
+            self.active_jobs.add(task)
+            logger.info("Started processing intake %s (active jobs: %d)", intake.get("id"), len(self.active_jobs))
+    
+    async def _release_prefetched(self):
+        """Hand claimed but unstarted intakes back to the ready queue."""
+        while not self._prefetched.empty():
+            intake = self._prefetched.get_nowait()
+            self._prefetch_room.release()
+            if await self.db.update_intake_status(intake.get("id"), "ready"):
+                logger.info("Released prefetched intake %s", intake.get("id"))
+            else:
+                logger.warning("Failed to release prefetched intake %s", intake.get("id"))
+    
+    async def _cancel_active_jobs(self):
+        """Cancel in-flight jobs and give them a moment to finish."""
+        if not self.active_jobs:
+            return
+        
+        logger.info("Cancelling active jobs...")
+        for job in list(self.active_jobs):
+            job.cancel()
+        
+        _, pending = await asyncio.wait(list(self.active_jobs), timeout=JOB_CANCEL_TIMEOUT)
+        if pending:
+            logger.warning("Some jobs didn't finish within timeout")
     
     async def _process_intake_safely(self, intake_data: dict):
         """
@@ -203,58 +323,55 @@ class ExtractionWorker:
             intake_data: Intake record from database
         """
         intake_id = intake_data.get("id")
-        start_time = datetime.now(timezone.utc)
+        start_time = time.monotonic()
         
         try:
-            logger.info(f"🔄 Processing intake {intake_id}")
+            logger.info("🔄 Processing intake %s", intake_id)
             success = await self.processor.process_intake(intake_data)
             
-            end_time = datetime.now(timezone.utc)
-            duration = (end_time - start_time).total_seconds()
+            duration = time.monotonic() - start_time
             
             if success:
-                logger.info(f"✅ Successfully processed intake {intake_id} in {duration:.2f}s")
+                self._counters["processed"] += 1
+                logger.info("✅ Successfully processed intake %s in %.2fs", intake_id, duration)
             else:
-                logger.warning(f"⚠️ Failed to process intake {intake_id} after {duration:.2f}s")
+                self._counters["failed"] += 1
+                logger.warning("⚠️ Failed to process intake %s after %.2fs", intake_id, duration)
                 
         except Exception as e:
-            end_time = datetime.now(timezone.utc)
-            duration = (end_time - start_time).total_seconds()
-            logger.error(f"❌ Error processing intake {intake_id} after {duration:.2f}s: {e}", exc_info=True)
+            duration = time.monotonic() - start_time
+            self._counters["errors"] += 1
+            logger.error("❌ Error processing intake %s after %.2fs: %s", intake_id, duration, e, exc_info=True)
             
             # Try to update the intake status to indicate processing error
             try:
                 attempts = intake_data.get("attempts", 0)
                 await self.db.schedule_retry(intake_id, attempts, f"Worker processing error: {str(e)}")
             except Exception as update_error:
-                logger.error(f"Failed to update intake {intake_id} after processing error: {update_error}")
-    
-    def _cleanup_completed_jobs(self):
-        """Remove completed jobs from the active jobs set."""
-        completed_jobs = {job for job in self.active_jobs if job.done()}
-        self.active_jobs -= completed_jobs
-        
-        if completed_jobs:
-            logger.debug(f"Cleaned up {len(completed_jobs)} completed jobs")
+                logger.error("Failed to update intake %s after processing error: %s", intake_id, update_error)
     
     async def _log_worker_stats(self):
-        """Log worker statistics."""
+        """
+        Log worker statistics.
+        
+        Outcome counts come from this worker's in-memory counters; only the queue
+        gauges are read from the database (and that read is TTL-cached).
+        """
         try:
             stats = await self.db.get_worker_stats()
             
             logger.info(
-                f"📊 Worker Stats - "
-                f"Ready: {stats.get('ready_count', 0)}, "
-                f"Processing: {stats.get('processing_count', 0)}, "
-                f"Done: {stats.get('done_count', 0)}, "
-                f"Failed: {stats.get('failed_max_attempts_count', 0)}, "
-                f"Recent Errors: {stats.get('recent_errors_count', 0)}, "
-                f"Total Memories: {stats.get('total_memories_count', 0)}, "
-                f"Active Jobs: {len(self.active_jobs)}"
+                WORKER_STATS_LOG_FORMAT,
+                stats.get("ready_count", 0),
+                stats.get("processing_count", 0),
+                self._counters["processed"],
+                self._counters["failed"],
+                self._counters["errors"],
+                len(self.active_jobs)
             )
             
         except Exception as e:
-            logger.error(f"Error logging worker stats: {e}")
+            logger.error("Error logging worker stats: %s", e)
     
     async def get_status(self) -> dict:
         """Get current worker status."""
@@ -266,12 +383,14 @@ class ExtractionWorker:
                 "polling_interval": self.polling_interval,
                 "max_concurrent_jobs": self.max_concurrent_jobs,
                 "active_jobs": len(self.active_jobs),
+                "prefetched_intakes": self._prefetched.qsize(),
+                "job_counters": dict(self._counters),
                 "database_stats": stats,
                 "uptime_check": datetime.now(timezone.utc).isoformat()
             }
             
         except Exception as e:
-            logger.error(f"Error getting worker status: {e}")
+            logger.error("Error getting worker status: %s", e)
             return {
                 "worker_status": "error",
                 "error": str(e)
@@ -293,52 +412,24 @@ class ExtractionWorker:
             intake_data = await self.db.get_intake_details(intake_id, org_id)
             
             if not intake_data:
-                logger.error(f"Intake {intake_id} not found for org {org_id}")
+                logger.error("Intake %s not found for org %s", intake_id, org_id)
                 return False
             
             # Check if intake is in a processable state
             status = intake_data.get("status")
             if status not in ["ready", "error_config_failed", "error_storage_failed", "error_processing_failed"]:
-                logger.error(f"Intake {intake_id} is not in a processable state (status: {status})")
+                logger.error("Intake %s is not in a processable state (status: %s)", intake_id, status)
                 return False
             
             # Try to claim for processing
             if not await self.db.claim_intake_for_processing(intake_id, org_id):
-                logger.error(f"Failed to claim intake {intake_id} for processing")
+                logger.error("Failed to claim intake %s for processing", intake_id)
                 return False
             
             # Process the intake
-            logger.info(f"Manually processing intake {intake_id}")
+            logger.info("Manually processing intake %s", intake_id)
             return await self.processor.process_intake(intake_data)
             
         except Exception as e:
-            logger.error(f"Error manually processing intake {intake_id}: {e}")
+            logger.error("Error manually processing intake %s: %s", intake_id, e)
             return False
-
-# Singleton worker instance for the application
-_worker_instance: Optional[ExtractionWorker] = None
-
-def get_worker() -> ExtractionWorker:
-    """Get the singleton worker instance."""
-    global _worker_instance
-    if _worker_instance is None:
-        _worker_instance = ExtractionWorker()
-    return _worker_instance
-
-async def start_worker():
-    """Start the worker service."""
-    worker = get_worker()
-    await worker.start()
-
-async def stop_worker():
-    """Stop the worker service."""
-    global _worker_instance
-    if _worker_instance:
-        _worker_instance.stop()
-        # Give it a moment to stop gracefully
-        await asyncio.sleep(0.1)
-
-def get_worker_status() -> dict:
-    """Get worker status (sync version)."""
-    worker = get_worker()
-    return asyncio.run(worker.get_status())
@@ -3,190 +3,138 @@ Storage operations for the extraction worker.
 Handles downloading files from Supabase Storage and checksum verification.
 """
 
-import hashlib
+import httpx
 import logging
-from typing import Optional, Tuple
-from supabase import Client
+from typing import Any, AsyncIterator, Dict, List, Optional
+from urllib.parse import quote
+
+from app.core.checksum import format_checksum, new_hasher
+from app.core.config import config
 
 logger = logging.getLogger(__name__)
 
+STREAM_CHUNK_SIZE = 64 * 1024  # bytes
+
+class ChecksumMismatchError(ValueError):
+    """Raised when streamed content does not match the intake's recorded checksum."""
+
 class WorkerStorage:
     """Storage operations for the extraction worker."""
     
-    def __init__(self, supabase_client: Client):
+    def __init__(self, http_client: Optional[httpx.AsyncClient] = None):
         """
         Initialize worker storage operations.
         
+        Storage is accessed through its REST API with an async HTTP client rather than
+        supabase-py, whose storage calls are synchronous and would block the event loop
+        (shared with the API).
+        
         Args:
-            supabase_client: Supabase client instance
+            http_client: Optional HTTP client for the Storage API (creates new one if None)
         """
-        self.client = supabase_client
         self.bucket_name = "intakes-raw"
+        self._http = http_client or httpx.AsyncClient(
+            base_url=f"{config.supabase_url}/storage/v1",
+            headers={"Authorization": f"Bearer {config.supabase_key}", "apikey": config.supabase_key},
+            timeout=httpx.Timeout(60.0),
+            # Pool sized to worker concurrency so connections are reused across intakes
+            limits=httpx.Limits(
+                max_keepalive_connections=config.worker_max_concurrent_jobs,
+                max_connections=config.worker_max_concurrent_jobs
+            )
+        )
     
-    async def download_intake_content(self, storage_path: str) -> Optional[str]:
-        """
-        Download the content of an intake from storage.
-        
-        Args:
-            storage_path: Storage path for the intake (e.g., "org/org1/intake/123/")
-            
-        Returns:
-            File content as string if successful, None otherwise
-        """
-        try:
-            # Remove trailing slash for proper path handling
-            path_for_listing = storage_path.rstrip('/')
-            
-            # List files in the intake directory
-            files_result = self.client.storage.from_(self.bucket_name).list(path_for_listing)
-            
-            if not files_result or len(files_result) == 0:
-                logger.error(f"No files found in storage path: {storage_path}")
-                return None
-            
-            # Get the first file (assuming one file per intake for MVP)
-            file_info = files_result[0]
-            file_path = f"{path_for_listing}/{file_info['name']}"
-            
-            logger.info(f"Downloading file: {file_path}")
-            
-            # Download file content
-            file_content = self.client.storage.from_(self.bucket_name).download(file_path)
-            
-            if file_content:
-                # Convert bytes to string if needed
-                if isinstance(file_content, bytes):
-                    content_str = file_content.decode('utf-8')
-                else:
-                    content_str = str(file_content)
-                
-                logger.info(f"Successfully downloaded {len(content_str)} characters from {file_path}")
-                return content_str
-            else:
-                logger.error(f"Empty content downloaded from {file_path}")
-                return None
-                
-        except Exception as e:
-            logger.error(f"Error downloading content from {storage_path}: {e}")
-            return None
+    async def close(self):
+        """Close the HTTP client used for the Storage API."""
+        await self._http.aclose()
     
-    async def verify_checksum(self, content: str, expected_checksum: str) -> bool:
+    async def _list(self, path_for_listing: str) -> List[Dict[str, Any]]:
         """
-        Verify the checksum of downloaded content.
+        List the objects under a folder, like supabase-py's `list`.
         
         Args:
-            content: Content to verify
-            expected_checksum: Expected MD5 checksum
+            path_for_listing: Folder path within the bucket, without trailing slash
             
         Returns:
-            True if checksum matches, False otherwise
+            Object descriptions (name, metadata, ...) sorted by name
         """
-        try:
-            # Calculate MD5 checksum of content
-            if isinstance(content, str):
-                content_bytes = content.encode('utf-8')
-            else:
-                content_bytes = content
-            
-            calculated_checksum = hashlib.md5(content_bytes).hexdigest()
-            
-            if calculated_checksum == expected_checksum:
-                logger.debug(f"Checksum verification passed: {calculated_checksum}")
-                return True
-            else:
-                logger.error(f"Checksum mismatch. Expected: {expected_checksum}, Calculated: {calculated_checksum}")
-                return False
-                
-        except Exception as e:
-            logger.error(f"Error verifying checksum: {e}")
-            return False
+        response = await self._http.post(
+            f"/object/list/{self.bucket_name}",
+            json={"prefix": path_for_listing, "limit": 100, "offset": 0, "sortBy": {"column": "name", "order": "asc"}}
+        )
+        response.raise_for_status()
+        return response.json()
     
-    async def download_and_verify(self, storage_path: str, expected_checksum: str) -> Optional[str]:
+    def _object_url(self, object_path: str) -> str:
         """
-        Download content and verify its checksum in one operation.
+        Build the Storage API URL of an object.
+        
+        The path ends in the uploaded filename, so it is percent-encoded; otherwise a
+        '#', '?' or '%' in the name would be read as URL syntax.
         
         Args:
-            storage_path: Storage path for the intake
-            expected_checksum: Expected MD5 checksum
+            object_path: Object path within the bucket
             
         Returns:
-            File content if download and verification successful, None otherwise
+            URL relative to the Storage API base URL
         """
-        try:
-            # Download content
-            content = await self.download_intake_content(storage_path)
-            
-            if content is None:
-                return None
-            
-            # Verify checksum
-            if not await self.verify_checksum(content, expected_checksum):
-                logger.error(f"Checksum verification failed for {storage_path}")
-                return None
-            
-            logger.info(f"Successfully downloaded and verified content from {storage_path}")
-            return content
-            
-        except Exception as e:
-            logger.error(f"Error in download and verify for {storage_path}: {e}")
-            return None
+        return f"/object/{self.bucket_name}/{quote(object_path, safe='/')}"
     
-    async def get_file_info(self, storage_path: str) -> Optional[Tuple[str, int]]:
+    async def get_object_path(self, storage_path: str) -> Optional[str]:
         """
-        Get information about the file in the storage path.
+        Resolve the path of the file stored under an intake's storage path.
         
         Args:
-            storage_path: Storage path for the intake
+            storage_path: Storage path for the intake (e.g., "org/org1/intake/123/")
             
         Returns:
-            Tuple of (filename, size) if found, None otherwise
+            Object path within the bucket if a file exists, None otherwise
         """
         try:
             # Remove trailing slash for proper path handling
             path_for_listing = storage_path.rstrip('/')
             
-            # List files in the intake directory
-            files_result = self.client.storage.from_(self.bucket_name).list(path_for_listing)
+            files_result = await self._list(path_for_listing)
             
-            if not files_result or len(files_result) == 0:
-                logger.warning(f"No files found in storage path: {storage_path}")
+            if not files_result:
+                logger.error(f"No files found in storage path: {storage_path}")
                 return None
             
-            # Get the first file info
-            file_info = files_result[0]
-            filename = file_info.get('name', 'unknown')
-            file_size = file_info.get('metadata', {}).get('size', 0)
-            
-            return filename, file_size
+            # Get the first file (assuming one file per intake for MVP)
+            return f"{path_for_listing}/{files_result[0]['name']}"
             
         except Exception as e:
-            logger.error(f"Error getting file info for {storage_path}: {e}")
+            logger.error(f"Error resolving object in {storage_path}: {e}")
             return None
     
-    async def list_intake_files(self, storage_path: str) -> Optional[list]:
+    async def open_stream(self, object_path: str, expected_checksum: str) -> AsyncIterator[bytes]:
         """
-        List all files in an intake storage path.
+        Stream an object's bytes, verifying its checksum in the same pass.
+        
+        The checksum is checked after the last chunk and before the generator finishes,
+        so a consumer forwarding the chunks never completes a request with bad content.
         
         Args:
-            storage_path: Storage path for the intake
-            
-        Returns:
-            List of file information dictionaries, None if error
-        """
-        try:
-            # Remove trailing slash for proper path handling
-            path_for_listing = storage_path.rstrip('/')
+            object_path: Object path within the bucket (see `get_object_path`)
+            expected_checksum: Expected checksum as recorded on the intake (see app.core.checksum)
             
-            # List files in the intake directory
-            files_result = self.client.storage.from_(self.bucket_name).list(path_for_listing)
+        Yields:
+            Chunks of the object's content
             
-            if files_result:
-                logger.debug(f"Found {len(files_result)} files in {storage_path}")
-                return files_result
-            else:
-                logger.warning(f"No files found in storage path: {storage_path}")
-                return []
-                
-        except Exception as e:
-            logger.error(f"Error listing files in {storage_path}: {e}")
-            return None
+        Raises:
+            ChecksumMismatchError: If the streamed bytes do not match the checksum
+            httpx.HTTPStatusError: If storage rejects the download
+        """
+        checksum = new_hasher(expected_checksum)
+        
+        async with self._http.stream("GET", self._object_url(object_path)) as response:
+            response.raise_for_status()
+            async for chunk in response.aiter_bytes(STREAM_CHUNK_SIZE):
+                checksum.update(chunk)
+                yield chunk
+        
+        calculated_checksum = format_checksum(checksum)
+        if calculated_checksum != expected_checksum:
+            raise ChecksumMismatchError(
+                f"Checksum mismatch for {object_path}. Expected: {expected_checksum}, Calculated: {calculated_checksum}"
+            )